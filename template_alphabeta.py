@@ -1,4 +1,39 @@
 from agent import Agent
+from typing import NamedTuple
+from shobu import ShobuAction
+from collections import defaultdict
+import random
+import time
+
+# Score of a won game, larger than any evaluation of a non-terminal state
+WIN_SCORE = 1000
+
+# Flags of the transposition table entries
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# Depth up to which the successor states are cached. Only the children of the root are reused by every
+# iteration of the search, and each state weighs about 13 kB with its actions.
+RESULT_CACHE_MAX_DEPTH = 1
+
+
+class TTEntry(NamedTuple):
+    """Represents an entry of the transposition table.
+
+    Attributes:
+        depth (int): The remaining depth of the search that produced this entry.
+        value (float): The value found for the state, a win or a loss being counted from the state itself.
+        flag (int): Whether the value is EXACT, a LOWER bound or an UPPER bound of the real value.
+        move (ShobuAction): The best action found for the state.
+    """
+    depth: int
+    value: float
+    flag: int
+    move: ShobuAction
+
+
+class SearchTimeout(Exception):
+    """Raised when the time allocated to the search of a move is exhausted."""
+
 
 class AlphaBetaAgent(Agent):
     """An agent that uses the alpha-beta pruning algorithm to determine the best move.
@@ -8,6 +43,10 @@ class AlphaBetaAgent(Agent):
 
     Attributes:
         max_depth (int): The maximum depth the search algorithm will explore.
+        tt (dict[tuple, TTEntry]): The transposition table, mapping the key of a state (see tt_key) to its search result.
+        killers (list[list[ShobuAction]]): The two last actions that produced a cutoff at each depth of the search tree.
+        history (dict[tuple, int]): The history heuristic, scoring the moves that produced cutoffs during the search.
+        result_cache (dict[tuple, ShobuState]): The successor states of the shallowest nodes computed during the search.
     """
 
     def __init__(self, player, game, max_depth):
@@ -21,6 +60,15 @@ class AlphaBetaAgent(Agent):
         super().__init__(player, game)
         self.max_depth = max_depth
 
+        # Zobrist keys: one per (home board, square, color) and one for the player to move
+        self.zobrist_keys = [[[random.getrandbits(64) for _ in range(2)] for _ in range(16)] for _ in range(4)]
+        self.zobrist_to_move = random.getrandbits(64)
+        self.tt = {}
+        self.deadline = float("inf")
+        self.killers = [[None, None] for _ in range(self.max_depth + 1)]
+        self.history = defaultdict(int)
+        self.result_cache = {}
+
     def play(self, state, remaining_time):
         """Determines the best action by applying the alpha-beta pruning algorithm.
 
@@ -33,22 +81,41 @@ class AlphaBetaAgent(Agent):
         Returns:
             ShobuAction: The action determined to be the best by the alpha-beta algorithm.
         """
-        return self.alpha_beta_search(state)
+        self.tt.clear()
+        self.killers = [[None, None] for _ in range(self.max_depth + 1)]
+        self.history.clear()
+        # A game rarely lasts more than 30 moves per player
+        self.deadline = time.perf_counter() + remaining_time / 30
+        try:
+            return self.alpha_beta_search(state)
+        finally:
+            # Do not hold the cached states between two moves
+            self.result_cache.clear()
     
-    def is_cutoff(self, state, depth):
-        """Determines if the search should be cut off at the current depth.
+    def cut_info(self, state, depth, depth_limit):
+        """Determines if the search should be cut off at the current depth, and the value of the state if it is terminal.
+
+        A terminal state is scored directly, preferring the wins found closer to the root and the losses found
+        further from it, so that the evaluation of its pieces is skipped.
 
         Args:
             state (ShobuState): The current state of the game.
             depth (int): The current depth in the search tree.
+            depth_limit (int): The maximum depth of the current iteration of the search.
 
         Returns:
-            bool: True if the search should be cut off, False otherwise.
+            tuple: A tuple containing True if the search should be cut off, False otherwise, and the value of the state
+                if it is terminal, None otherwise.
         """
-        if depth >= self.max_depth or self.game.is_terminal(state): # That's mean the search tree is too deep
-            return True
-        
-        return False
+        if self.game.is_terminal(state):
+            utility = self.game.utility(state, self.player)
+            if utility > 0:
+                return (True, WIN_SCORE - depth)
+            elif utility < 0:
+                return (True, -WIN_SCORE + depth)
+            return (True, 0)
+
+        return (depth >= depth_limit, None)
     
     def eval(self, state):
         """Evaluates the given state and returns a score from the perspective of the agent's player.
@@ -59,28 +126,202 @@ class AlphaBetaAgent(Agent):
         Returns:
             float: The evaluated score of the state.
         """
-        pieces_player, pieces_opponent = float("inf"), float("inf")
-        
-        board = state.board
-        for home_board_id, home_board in enumerate(board):
-            pieces_player = min(len(home_board[self.player]), pieces_player)
-            pieces_opponent = min(len(home_board[1 - self.player]), pieces_opponent)
+        # The stones of each color are stored in a set per home board, so counting them is a single len() call
+        player, opponent = self.player, 1 - self.player
+        board_0, board_1, board_2, board_3 = state.board
+        pieces_player = min(len(board_0[player]), len(board_1[player]), len(board_2[player]), len(board_3[player]))
+        pieces_opponent = min(len(board_0[opponent]), len(board_1[opponent]), len(board_2[opponent]), len(board_3[opponent]))
 
         return pieces_player - pieces_opponent
 
+    def zobrist_hash(self, state):
+        """Computes the Zobrist hash of the given state.
+
+        Two states with the same stones on the 4 home boards and the same player to move share the same hash.
+
+        Args:
+            state (ShobuState): The game state to hash.
+
+        Returns:
+            int: The 64 bits hash of the state.
+        """
+        h = self.zobrist_to_move if state.to_move else 0
+        for home_board_keys, home_board in zip(self.zobrist_keys, state.board):
+            for color in (0, 1):
+                for stone in home_board[color]:
+                    h ^= home_board_keys[stone][color]
+
+        return h
+
+    def tt_key(self, state):
+        """Computes the key of a state in the transposition table.
+
+        The count of boring actions is not part of the Zobrist hash but it decides draws, so two states with the
+        same stones can only share a value if they are also as far from the draw limit.
+
+        Args:
+            state (ShobuState): The game state to get the key of.
+
+        Returns:
+            tuple: The (Zobrist hash, count of boring actions) key of the state.
+        """
+        return (self.zobrist_hash(state), state.count_boring_actions)
+
+    @staticmethod
+    def to_tt_value(v, depth):
+        """Converts a value found at a depth of the search tree into a value relative to the state.
+
+        The score of a win or a loss depends on its distance to the root (see cut_info), while a state of the
+        transposition table can be reached again at another depth. It is therefore stored as a distance from
+        the state itself.
+
+        Args:
+            v (float): The value of the state, relative to the root.
+            depth (int): The depth in the search tree of the state.
+
+        Returns:
+            float: The value of the state, relative to the state.
+        """
+        if v > WIN_SCORE // 2:
+            return v + depth
+        if v < -WIN_SCORE // 2:
+            return v - depth
+        return v
+
+    @staticmethod
+    def from_tt_value(v, depth):
+        """Converts a value stored in the transposition table back into a value relative to the root.
+
+        Args:
+            v (float): The value of the state, relative to the state.
+            depth (int): The depth in the search tree at which the state is reached.
+
+        Returns:
+            float: The value of the state, relative to the root.
+        """
+        if v > WIN_SCORE // 2:
+            return v - depth
+        if v < -WIN_SCORE // 2:
+            return v + depth
+        return v
+
+    def tt_store(self, key, depth, remaining_depth, v, alpha_orig, beta_orig, move):
+        """Stores the result of a search in the transposition table.
+
+        Args:
+            key (tuple): The key of the searched state.
+            depth (int): The depth in the search tree of the searched state.
+            remaining_depth (int): The depth that was still to explore below the state.
+            v (float): The value found for the state.
+            alpha_orig (float): The alpha value the search of the state started with.
+            beta_orig (float): The beta value the search of the state started with.
+            move (ShobuAction): The best action found for the state.
+        """
+        if v <= alpha_orig:
+            flag = UPPER
+        elif v >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt[key] = TTEntry(remaining_depth, self.to_tt_value(v, depth), flag, move)
+
+    def cached_result(self, state, key, action, depth):
+        """Returns the state resulting from an action, reusing the successor computed by a previous iteration.
+
+        Only the successors of the states shallower than RESULT_CACHE_MAX_DEPTH are cached. They are stored under
+        the key of the state in the transposition table and the action.
+
+        Args:
+            state (ShobuState): The current state of the game.
+            key (tuple): The key of the state in the transposition table.
+            action (ShobuAction): The action to play.
+            depth (int): The current depth in the search tree.
+
+        Returns:
+            ShobuState: The state resulting from the execution of the action.
+        """
+        if depth >= RESULT_CACHE_MAX_DEPTH:
+            return self.game.result(state, action)
+
+        next_state = self.result_cache.get((key, action))
+        if next_state is None:
+            next_state = self.game.result(state, action)
+            self.result_cache[(key, action)] = next_state
+
+        return next_state
+
+    @staticmethod
+    def history_key(action):
+        """Returns the key of an action in the history table.
+
+        The key only depends on the passive move, so every action sharing a passive stone, direction and length
+        shares its score whatever the active board and stone.
+
+        Args:
+            action (ShobuAction): The action to get the key of.
+
+        Returns:
+            tuple: The (passive_board_id, passive_stone_id, direction, length) key of the action.
+        """
+        return (action.passive_board_id, action.passive_stone_id, action.direction, action.length)
+
+    def store_cutoff(self, action, depth, remaining_depth):
+        """Records an action that produced a cutoff in the killer moves and the history table.
+
+        Args:
+            action (ShobuAction): The action that produced the cutoff.
+            depth (int): The depth in the search tree of the state the action was played from.
+            remaining_depth (int): The depth that was still to explore below the state.
+        """
+        killers = self.killers[depth]
+        if killers[0] != action:
+            killers[1] = killers[0]
+            killers[0] = action
+        self.history[self.history_key(action)] += 1 << remaining_depth
+
+    def ordered_actions(self, state, depth, tt_move):
+        """Returns the actions of the state in the order they should be explored.
+
+        The best action found by a previous search of the state is tried first, followed by the killer moves
+        of the depth and then by the actions that produced the most cutoffs so far.
+
+        Args:
+            state (ShobuState): The current state of the game.
+            depth (int): The current depth in the search tree.
+            tt_move (ShobuAction): The best action stored in the transposition table for the state, or None.
+
+        Returns:
+            list of ShobuAction: The actions of the state.
+        """
+        killers = self.killers[depth]
+        history = self.history
+        history_key = self.history_key
+
+        return sorted(state.actions, key=lambda a: (a == tt_move, a in killers, history.get(history_key(a), 0)), reverse=True)
+
     def alpha_beta_search(self, state):
         """Implements the alpha-beta pruning algorithm to find the best action.
 
+        The search is iteratively deepened up to max_depth, each iteration ordering the actions with the
+        best moves found by the previous one. If the time allocated to the move runs out, the action of
+        the last completed iteration is returned.
+
         Args:
             state (ShobuState): The current game state.
 
         Returns:
             ShobuAction: The best action as determined by the alpha-beta algorithm.
         """
-        _, action = self.max_value(state, -float("inf"), float("inf"), 0)
+        action = None
+        for depth_limit in range(1, self.max_depth + 1):
+            try:
+                _, action = self.max_value(state, -float("inf"), float("inf"), 0, depth_limit)
+            except SearchTimeout:
+                break
+
         return action
 
-    def max_value(self, state, alpha, beta, depth):
+    def max_value(self, state, alpha, beta, depth, depth_limit):
         """Computes the maximum achievable value for the current player at a given state using the alpha-beta pruning.
 
         This method recursively explores all possible actions from the current state to find the one that maximizes
@@ -94,27 +335,54 @@ class AlphaBetaAgent(Agent):
             alpha (float): The current alpha value, representing the minimum score that the maximizing player is assured of.
             beta (float): The current beta value, representing the maximum score that the minimizing player is assured of.
             depth (int): The current depth in the search tree.
+            depth_limit (int): The maximum depth of the current iteration of the search.
 
         Returns:
             tuple: A tuple containing the best value achievable from this state and the action that leads to this value.
                 If the state is a terminal state or the depth limit is reached, the action will be None.
         """
-        if self.is_cutoff(state, depth):
-            return (self.eval(state), None)
+        cut, terminal_value = self.cut_info(state, depth, depth_limit)
+        if cut:
+            return (terminal_value if terminal_value is not None else self.eval(state), None)
         
+        # The first iteration must complete so that an action is always available
+        if depth_limit > 1 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+        key = self.tt_key(state)
+        remaining_depth = depth_limit - depth
+        alpha_orig, beta_orig = alpha, beta
+
+        entry = self.tt.get(key)
+        tt_move = None
+        if entry is not None:
+            tt_move = entry.move
+            if entry.depth >= remaining_depth:
+                value = self.from_tt_value(entry.value, depth)
+                if entry.flag == EXACT:
+                    return (value, entry.move)
+                elif entry.flag == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return (value, entry.move)
+
         v, move = -float("inf"), None
-        for action in state.actions:
-            v2, a2 = self.min_value(self.game.result(state, action), alpha, beta, depth + 1)
+        for action in self.ordered_actions(state, depth, tt_move):
+            v2, a2 = self.min_value(self.cached_result(state, key, action, depth), alpha, beta, depth + 1, depth_limit)
             if v2 > v:
                 v, move = v2, action
-                alpha = max(alpha, v)
             if v >= beta:
-                return (v, move)
-        
+                self.store_cutoff(action, depth, remaining_depth)
+                break
+            alpha = max(alpha, v)
+
+        self.tt_store(key, depth, remaining_depth, v, alpha_orig, beta_orig, move)
         return (v, move)
 
 
-    def min_value(self, state, alpha, beta, depth):
+    def min_value(self, state, alpha, beta, depth, depth_limit):
         """Computes the minimum achievable value for the opposing player at a given state using the alpha-beta pruning.
 
         Similar to max_value, this method recursively explores all possible actions from the current state to find
@@ -129,22 +397,49 @@ class AlphaBetaAgent(Agent):
             alpha (float): The current alpha value, representing the minimum score that the maximizing player is assured of.
             beta (float): The current beta value, representing the maximum score that the minimizing player is assured of.
             depth (int): The current depth in the search tree.
+            depth_limit (int): The maximum depth of the current iteration of the search.
 
         Returns:
             tuple: A tuple containing the best value achievable from this state for the opponent and the action that leads to this value.
                 If the state is a terminal state or the depth limit is reached, the action will be None.
         """
-        if self.is_cutoff(state, depth):
-            return (self.eval(state), None)
+        cut, terminal_value = self.cut_info(state, depth, depth_limit)
+        if cut:
+            return (terminal_value if terminal_value is not None else self.eval(state), None)
         
+        # The first iteration must complete so that an action is always available
+        if depth_limit > 1 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+        key = self.tt_key(state)
+        remaining_depth = depth_limit - depth
+        alpha_orig, beta_orig = alpha, beta
+
+        entry = self.tt.get(key)
+        tt_move = None
+        if entry is not None:
+            tt_move = entry.move
+            if entry.depth >= remaining_depth:
+                value = self.from_tt_value(entry.value, depth)
+                if entry.flag == EXACT:
+                    return (value, entry.move)
+                elif entry.flag == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return (value, entry.move)
+
         v, move = float("inf"), None
-        for action in state.actions:
-            v2, a2 = self.max_value(self.game.result(state, action), alpha, beta, depth + 1)
+        for action in self.ordered_actions(state, depth, tt_move):
+            v2, a2 = self.max_value(self.cached_result(state, key, action, depth), alpha, beta, depth + 1, depth_limit)
             if v2 < v:
                 v, move = v2, action
-                beta = min(beta, v)
             if v <= alpha:
-                return (v, move)
-        
+                self.store_cutoff(action, depth, remaining_depth)
+                break
+            beta = min(beta, v)
+
+        self.tt_store(key, depth, remaining_depth, v, alpha_orig, beta_orig, move)
         return (v, move)
     
\ No newline at end of file
@@ -1,4 +1,5 @@
 from agent import Agent
+from collections import deque
 import random
 import math
 
@@ -13,9 +14,12 @@ class Node:
         state (ShobuState): The game state represented by this node.
         U (int): The total reward of the node.
         N (int): The number of times the node has been visited.
-        children (dict[Node, ShobuAction]): A dictionary mapping child nodes to their corresponding actions that lead to the state they represent.
+        children (list[tuple[Node, ShobuAction]]): A list pairing child nodes with their corresponding actions that lead to the state they represent.
+        unexpanded (deque[Node]): The children for which no simulation has yet been performed, in random order.
     """
 
+    __slots__ = ('parent', 'state', 'U', 'N', 'children', 'unexpanded')
+
     def __init__(self, parent, state):
         """Initializes a new Node object.
 
@@ -27,7 +31,8 @@ class Node:
         self.state = state
         self.U = 0
         self.N = 0
-        self.children = {}
+        self.children = []
+        self.unexpanded = deque()
 
 class UCTAgent(Agent):
     """An agent that uses the UCT algorithm to determine the best move.
@@ -64,6 +69,17 @@ class UCTAgent(Agent):
         """
         return self.uct(state)
 
+    def create_children(self, node):
+        """Creates all the children of a node and queues them, shuffled, as not yet simulated.
+
+        Args:
+            node (Node): The node to create the children of.
+        """
+        node.children = [(Node(node, self.game.result(node.state, action)), action) for action in self.game.actions(node.state)]
+        children = [child for child, _ in node.children]
+        random.shuffle(children)
+        node.unexpanded = deque(children)
+
     def uct(self, state):
         """Executes the UCT algorithm to find the best action from the current state.
 
@@ -74,19 +90,18 @@ class UCTAgent(Agent):
             ShobuAction: The action leading to the best-perceived outcome based on UCT algorithm.
         """
         root = Node(None, state)
-        root.children = {Node(root, self.game.result(root.state, action)): action for action in self.game.actions(root.state)}
+        self.create_children(root)
         for _ in range(self.iteration):
             leaf = self.select(root)
             child = self.expand(leaf)
             result = self.simulate(child.state)
             self.back_propagate(result, child)
-        max_state = max(root.children, key=lambda n: n.N)
-        return root.children.get(max_state)
+        return max(root.children, key=lambda pair: pair[0].N)[1]
 
     def select(self, node):
         """Selects a leaf node using the UCB1 formula to maximize exploration and exploitation.
 
-        The function recursively selects the children of the node that maximise the UCB1 score, exploring the most promising
+        The function iteratively selects the children of the node that maximise the UCB1 score, exploring the most promising
         path in the game tree. It stops when a leaf is found and returns it. A leaf is either a node in a terminal state,
         or a node with a child for which no simulation has yet been performed.
 
@@ -96,35 +111,20 @@ class UCTAgent(Agent):
         Returns:
             Node: The selected leaf node.
         """
-        # Return a leaf
-        child_without_simulation = any(child.N == 0 for child in node.children)
-        if child_without_simulation or self.game.is_terminal(node.state):
-            return node
-
-        max_value = float("-inf")
+        while True:
+            # Return a leaf
+            if node.unexpanded or self.game.is_terminal(node.state):
+                return node
 
-        # Select the child with the highest UCB1 value
-        for child in node.children:
-            child_UCB1 = self.UCB1(child)
-
-            if child_UCB1 > max_value:
-                max_value = child_UCB1
-                best_child = child
-
-                if max_value == float("inf"):
-                    break
-
-        # If the best child has not been visited, return his parent
-        if max_value == float("inf"):
-            return best_child.parent
-
-        return self.select(best_child)
+            # Select the child with the highest UCB1 value, all the children have been visited at least once
+            exploration = math.sqrt(2 * math.log(node.N))
+            node = max(node.children, key=lambda pair: self.UCB1(pair[0], exploration))[0]
 
     def expand(self, node):
         """Expands a node by adding a child node to the tree for an unexplored action.
 
         The function returns one of the children of the node for which no simulation has yet been performed.
-        In addition, the function must initialize all the children of that child node in the child's "children" dictionary.
+        In addition, the function must initialize all the children of that child node in the child's "children" list.
         If the node is in a terminal state, the function returns itself, indicating that the node can no longer be expanded.
 
         Args:
@@ -137,9 +137,8 @@ class UCTAgent(Agent):
             return node
 
         # Choose a child with no simulation and create all his children
-        children_without_simulation = [child for child in node.children if child.N == 0]
-        choosen_child = random.choice(children_without_simulation)
-        choosen_child.children = { Node(choosen_child, self.game.result(choosen_child.state, action)): action for action in self.game.actions(choosen_child.state) }
+        choosen_child = node.unexpanded.popleft()
+        self.create_children(choosen_child)
         
         return choosen_child
 
@@ -156,8 +155,9 @@ class UCTAgent(Agent):
 
         i = 0
         while (i < 500) and (not self.game.is_terminal(current_state)):
-            possible_actions = self.game.actions(current_state)
-            random_action = random.choice(possible_actions)
+            # The actions are a list stored in the state, index it directly rather than going through random.choice
+            possible_actions = current_state.actions
+            random_action = possible_actions[random.getrandbits(32) % len(possible_actions)]
             current_state = self.game.result(current_state, random_action)
             i += 1
 
@@ -184,11 +184,16 @@ class UCTAgent(Agent):
             result = 1 - result
             node = node.parent
 
-    def UCB1(self, node):
+    def UCB1(self, node, exploration=None):
         """Calculates the UCB1 value for a given node.
 
+        sqrt(2) * sqrt(log(N) / n) is computed as sqrt(2 * log(N)) / sqrt(n), where the exploration term
+        sqrt(2 * log(N)) only depends on the parent and can be computed once for all its children.
+
         Args:
             node (Node): The node to calculate the UCB1 value for.
+            exploration (float, optional): The precomputed sqrt(2 * log(N)) term of the parent of the node.
+                Computed from the parent if not given.
 
         Returns:
             float: The UCB1 value of the node. Returns infinity if the node has not been visited yet.
@@ -196,4 +201,7 @@ class UCTAgent(Agent):
         if node.N == 0:
             return float("inf")
 
-        return node.U / node.N + math.sqrt(2) * math.sqrt(math.log(node.parent.N) / node.N)
\ No newline at end of file
+        if exploration is None:
+            exploration = math.sqrt(2 * math.log(node.parent.N))
+
+        return node.U / node.N + exploration / math.sqrt(node.N)
\ No newline at end of file